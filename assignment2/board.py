@@ -10,7 +10,7 @@ The board uses a 1-dimensional representation with padding
 """
 
 import numpy as np
-from gtp_connection import point_to_coord
+from gtp_connection import point_to_coord, format_point
 from board_util import (
     GoBoardUtil,
     BLACK,
@@ -25,9 +25,14 @@ from board_util import (
     MAXSIZE,
     GO_POINT
 )
-import random
 from transposition_table import TranspositionTable
 
+# lane offsets used by the SWAR five-in-a-row test (2 bits per cell)
+_SHIFT2 = np.uint64(2)
+_SHIFT4 = np.uint64(4)
+_SHIFT6 = np.uint64(6)
+_SHIFT8 = np.uint64(8)
+
 """
 The GoBoard class implements a board and basic functions to play
 moves, check the end of the game, and count the acore at the end.
@@ -105,6 +110,13 @@ class GoBoard(object):
         assert len(self.rows) == self.size
         assert len(self.cols) == self.size
         assert len(self.diags) == (2 * (self.size - 5) + 1) * 2
+        # per-line point arrays and 2-bit lane shifts for the packed
+        # (SWAR) five-in-a-row test in detect_five_in_a_row
+        self._swar_lines = []
+        for line in self.rows + self.cols + self.diags:
+            points = np.array(line, dtype=np.intp)
+            shifts = np.uint64(2) * np.arange(len(line), dtype=np.uint64)
+            self._swar_lines.append((points, shifts))
 
     def reset(self, size):
         """
@@ -119,10 +131,23 @@ class GoBoard(object):
         self.maxpoint = size * size + 3 * (size + 1)
         self.board = np.full(self.maxpoint, BORDER, dtype=GO_POINT)
         self._initialize_empty_points(self.board)
+        # incremental empty-point list: _empties[:_empty_count] are the
+        # current empty points, _empty_pos maps a point to its slot
+        self._empties = where1d(self.board == EMPTY).astype(GO_POINT)
+        self._empty_count = self._empties.size
+        self._empty_pos = np.full(self.maxpoint, -1, dtype=GO_POINT)
+        self._empty_pos[self._empties] = np.arange(self._empty_count, dtype=GO_POINT)
         self.calculate_rows_cols_diags()
         self.drawWinner = BLACK
         self.hashTable = TranspositionTable()
         self.init_zobrist()
+        # precompute the GTP string for every point so per-move
+        # formatting is a single array fetch
+        self._point_str = np.empty(self.maxpoint, dtype=object)
+        for row in range(1, size + 1):
+            for col in range(1, size + 1):
+                point = coord_to_point(row, col, size)
+                self._point_str[point] = format_point(point_to_coord(point, size))
 
     def copy(self):
         b = GoBoard(self.size)
@@ -133,6 +158,12 @@ class GoBoard(object):
         b.current_player = self.current_player
         assert b.maxpoint == self.maxpoint
         b.board = np.copy(self.board)
+        b._empties = np.copy(self._empties)
+        b._empty_pos = np.copy(self._empty_pos)
+        b._empty_count = self._empty_count
+        # share the zobrist keys so copy and original hash identically
+        b.table = self.table
+        b.hash_value = self.hash_value
         return b
 
     def get_color(self, point):
@@ -155,8 +186,12 @@ class GoBoard(object):
         """
         Return:
             The empty points on the board
+        The list is maintained incrementally by play_move/undoMove, so
+        this is a short copy instead of a scan of the whole board.
+        A copy is returned because callers play and undo moves while
+        iterating over it.
         """
-        return where1d(self.board == EMPTY)
+        return self._empties[: self._empty_count].copy()
     
     def get_color_points(self, color):
         """
@@ -280,6 +315,8 @@ class GoBoard(object):
         elif self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self._remove_empty(point)
+        self._update_hash(point, color)
         self.current_player = GoBoardUtil.opponent(color)
         self.moves.append(point)
         return True
@@ -309,19 +346,20 @@ class GoBoard(object):
         """
         Returns BLACK or WHITE if any five in a row is detected for the color
         EMPTY otherwise.
-        """
-        for r in self.rows:
-            result = self.has_five_in_list(r)
-            if result != EMPTY:
-                return result
-        for c in self.cols:
-            result = self.has_five_in_list(c)
-            if result != EMPTY:
-                return result
-        for d in self.diags:
-            result = self.has_five_in_list(d)
-            if result != EMPTY:
-                return result
+        Each line is packed into a uint64 with one 2-bit lane per cell;
+        five consecutive stones of a color then show up as a nonzero
+        AND of four shifted copies of the color's lane word, so a whole
+        line is tested with a handful of 64-bit ALU ops.
+        """
+        board = self.board
+        for points, shifts in self._swar_lines:
+            vals = board[points]
+            b = np.bitwise_or.reduce((vals == BLACK).astype(np.uint64) << shifts)
+            if b & (b >> _SHIFT2) & (b >> _SHIFT4) & (b >> _SHIFT6) & (b >> _SHIFT8):
+                return BLACK
+            w = np.bitwise_or.reduce((vals == WHITE).astype(np.uint64) << shifts)
+            if w & (w >> _SHIFT2) & (w >> _SHIFT4) & (w >> _SHIFT6) & (w >> _SHIFT8):
+                return WHITE
         return EMPTY
 
     def detect_two_to_five_in_a_row(self):
@@ -458,7 +496,7 @@ class GoBoard(object):
     #2 if toplay has at most 2 in a row, 1 if toplay has at most 1 in a row, and -5,-4,-3,-2 in reverse cases
     def staticallyEvaluateForToPlay(self):
         detectionResult = self.detect_two_to_five_in_a_row()
-        if (self.get_empty_points().size == 0 and detectionResult[1] != 5):
+        if (self._empty_count == 0 and detectionResult[1] != 5):
             return 0
         if (detectionResult[0] == WHITE):
             if (self.current_player == BLACK):
@@ -472,44 +510,103 @@ class GoBoard(object):
                 return -detectionResult[1]
         return 1
 
+    def evaluate_and_terminal(self):
+        """
+        Fused endOfGame + staticallyEvaluateForToPlay.
+        Walks the precomputed lines once and returns the 2-tuple
+        (is_terminal, score for the current player), instead of
+        scanning the board separately for each of the two questions.
+        """
+        board = self.board
+        best_color = EMPTY
+        best_len = 1
+        for group in (self.rows, self.cols, self.diags):
+            for line in group:
+                prev = BORDER
+                counter = 1
+                for stone in line:
+                    color = board[stone]
+                    if color == prev:
+                        counter += 1
+                    else:
+                        counter = 1
+                        prev = color
+                    length = counter if counter < 5 else 5
+                    if prev != EMPTY and length > best_len:
+                        best_len = length
+                        best_color = prev
+        n_empty = self._empty_count
+        if n_empty == 0 and best_len != 5:
+            return (True, 0)
+        if best_color == EMPTY:
+            score = 1
+        elif best_color == self.current_player:
+            score = best_len
+        else:
+            score = -best_len
+        return (best_len == 5 or n_empty == 0, score)
+
     def endOfGame(self):
-        if (self.get_empty_points().size == 0):
+        if (self._empty_count == 0):
             return True
         staticallyEvaluate = self.staticallyEvaluateForToPlay()
         if (staticallyEvaluate == 5 or staticallyEvaluate == -5):
             return True
         return False
 
+    def _remove_empty(self, point):
+        """
+        O(1) removal of point from the empty list: swap it with the
+        last live entry and shrink. The removed point is parked in the
+        freed slot so the matching undoMove can restore it in O(1).
+        """
+        i = self._empty_pos[point]
+        last = self._empty_count - 1
+        last_point = self._empties[last]
+        self._empties[i] = last_point
+        self._empty_pos[last_point] = i
+        self._empties[last] = point
+        self._empty_pos[point] = last
+        self._empty_count = last
+
+    def _restore_empty(self, point):
+        """
+        Undo the most recent _remove_empty. Moves are played and
+        undone strictly last-in first-out, so the point sits parked
+        right past the live part of the list.
+        """
+        assert self._empties[self._empty_count] == point
+        self._empty_count += 1
+
     def undoMove(self):
         location = self.moves.pop()
+        self._update_hash(location, self.board[location])  # XOR is its own inverse
         self.board[location] = EMPTY
+        self._restore_empty(location)
         self.current_player = GoBoardUtil.opponent(self.current_player)
 
     #Sourced from Wikipedia:
     #https://en.wikipedia.org/wiki/Zobrist_hashing
     def init_zobrist(self):
         # fill a table of random numbers/bitstrings
-        self.table = np.empty((self.size * self.size,2), dtype=int)
-        for i in range(self.size * self.size):  # loop over the board, represented as a linear array
-            for j in range(2): #loop over the pieces
-                self.table[i][j] = random.randint(1,10000000)
+        self.table = np.random.RandomState(0).randint(
+            1, 2 ** 63 - 1, size=(self.size * self.size, 2), dtype=np.int64
+        )
+        self.hash_value = 0
 
-    #board is the 1d array attribute of the GoBoard object
+    #index into the zobrist table for a padded board point
+    def _zobrist_index(self, point):
+        row, col = divmod(point, self.NS)
+        return (row - 1) * self.size + (col - 1)
+
+    #XOR the key for (point, color) in or out of the incremental hash
+    def _update_hash(self, point, color):
+        self.hash_value ^= int(self.table[self._zobrist_index(point)][color - 1])
+
+    #the hash is maintained incrementally by play_move/undoMove
     def hash(self):
-        h = 0
-        for i in range(self.size*self.size):  # loop over the board positions
-            twodCoords = oned_twod(i, self.size)
-            if self.board[coord_to_point(twodCoords[0], twodCoords[1], self.size)] != EMPTY and self.board[coord_to_point(twodCoords[0], twodCoords[1], self.size)] != BORDER:
-                j = self.board[coord_to_point(twodCoords[0], twodCoords[1], self.size)] - 1 #since BLACK is 1 and WHITE is 2, and array indexing starts at 0
-                h = h ^ self.table[i][j]
-        return h
+        return self.hash_value
 
     def updateHash(self, board_copy):
         self.table = board_copy.table
         self.hashTable = board_copy.hashTable
-
-#returns the 2d (row,col) representation of the point, assuming the point ignores borders
-def oned_twod(point, boardsize):
-    row = (point // boardsize) + 1
-    col = (point % boardsize) + 1
-    return (row, col)
@@ -18,6 +18,11 @@ BORDER = 3
 INFINITY = 1000000
 
 
+class SearchTimeout(Exception):
+    """Raised when a solve runs past its deadline."""
+    pass
+
+
 def is_black_white(color):
     return color == BLACK or color == WHITE
 
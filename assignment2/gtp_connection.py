@@ -18,11 +18,29 @@ from board_util import (
     INFINITY,
     PASS,
     MAXSIZE,
+    SearchTimeout,
     coord_to_point,
 )
+from transposition_table import EXACT, LOWER, UPPER
 import numpy as np
 import re
-import signal, time
+import time
+
+try:
+    import numba_search
+except ImportError:
+    numba_search = None
+
+# 256-entry translation table mapping the color byte of each cell to
+# its display char (EMPTY '.', BLACK 'X', WHITE 'O', BORDER '?')
+_BOARD_TRANS = bytearray(b'?' * 256)
+_BOARD_TRANS[EMPTY] = ord('.')
+_BOARD_TRANS[BLACK] = ord('X')
+_BOARD_TRANS[WHITE] = ord('O')
+_BOARD_TRANS = bytes(_BOARD_TRANS)
+
+# strips the leading sequence number from regression test commands
+_LEADING_DIGITS = re.compile(r"^\d+")
 
 class GtpConnection:
     def __init__(self, go_engine, board, debug_mode=False):
@@ -39,6 +57,7 @@ class GtpConnection:
         self._debug_mode = debug_mode
         self.go_engine = go_engine
         self.board = board
+        self._outbuf = []
         self.commands = {
             "protocol_version": self.protocol_version_cmd,
             "quit": self.quit_cmd,
@@ -76,13 +95,26 @@ class GtpConnection:
             "legal_moves": (1, "Usage: legal_moves {w,b}"),
         }
 
+        # cache bound methods for the two hottest commands so get_cmd
+        # can dispatch them without a dict probe or attribute lookup
+        self._play_cmd = self.play_cmd
+        self._genmove_cmd = self.genmove_cmd
+
         self.time = 1
         self.genMoveRunning = False
+        if numba_search is not None:
+            # compile the search kernel now so the JIT cost is not
+            # paid inside the first timed solve
+            numba_search.warmup(self.board)
 
     def write(self, data):
-        stdout.write(data)
+        # accumulate output; flush() pushes it to stdout in one write
+        self._outbuf.append(data)
 
     def flush(self):
+        if self._outbuf:
+            stdout.write("".join(self._outbuf))
+            self._outbuf.clear()
         stdout.flush()
 
     def start_connection(self):
@@ -90,10 +122,11 @@ class GtpConnection:
         Start a GTP connection. 
         This function continuously monitors standard input for commands.
         """
-        line = stdin.readline()
-        while line:
+        for line in iter(stdin.readline, ''):
             self.get_cmd(line)
-            line = stdin.readline()
+            # make sure buffered output reaches the driver between
+            # commands, even if a handler only used write()
+            self.flush()
 
     def get_cmd(self, command):
         """
@@ -105,7 +138,7 @@ class GtpConnection:
             return
         # Strip leading numbers from regression tests
         if command[0].isdigit():
-            command = re.sub("^\d+", "", command).lstrip()
+            command = _LEADING_DIGITS.sub("", command).lstrip()
 
         elements = command.split()
         if not elements:
@@ -114,17 +147,23 @@ class GtpConnection:
         args = elements[1:]
         if self.has_arg_error(command_name, len(args)):
             return
+        # short-circuit the commands that dominate long test suites
+        if command_name == "play":
+            return self._play_cmd(args)
+        elif command_name == "genmove":
+            return self._genmove_cmd(args)
         if command_name in self.commands:
             try:
                 self.commands[command_name](args)
             except Exception as e:
-                self.debug_msg("Error executing command {}\n".format(str(e)))
-                self.debug_msg("Stack Trace:\n{}\n".format(traceback.format_exc()))
+                # only walk and format the stack when it will be shown
+                if self._debug_mode:
+                    self.debug_msg("Error executing command {}\n".format(str(e)))
+                    self.debug_msg("Stack Trace:\n{}\n".format(traceback.format_exc()))
                 raise e
         else:
             self.debug_msg("Unknown command: {}\n".format(command_name))
             self.error("Unknown command")
-            stdout.flush()
 
     def has_arg_error(self, cmd, argnum):
         """
@@ -144,13 +183,13 @@ class GtpConnection:
 
     def error(self, error_msg):
         """ Send error msg to stdout """
-        stdout.write("? {}\n\n".format(error_msg))
-        stdout.flush()
+        self.write("? {}\n\n".format(error_msg))
+        self.flush()
 
     def respond(self, response=""):
         """ Send response to stdout """
-        stdout.write("= {}\n\n".format(response))
-        stdout.flush()
+        self.write("= {}\n\n".format(response))
+        self.flush()
 
     def reset(self, size):
         """
@@ -220,10 +259,7 @@ class GtpConnection:
         board_color = args[0].lower()
         color = color_to_int(board_color)
         moves = GoBoardUtil.generate_legal_moves(self.board, color)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
+        gtp_moves = [self.board._point_str[move] for move in moves]
         sorted_moves = " ".join(sorted(gtp_moves))
         self.respond(sorted_moves)
         
@@ -304,15 +340,14 @@ class GtpConnection:
             self.respond("")
             return
         empty = self.board.get_empty_points()
-        output = []
-        for move in empty:
-            move_coord = point_to_coord(move, self.board.size)
-            output.append(format_point(move_coord))
+        output = self.board._point_str[empty].tolist()
         output.sort()
-        output_str = ""
-        for i in output:
-            output_str = output_str + i + " "
-        self.respond(output_str.lower())
+        if not output:
+            self.respond()
+            return
+        # one join sized up front instead of a full string
+        # reallocation per appended move
+        self.respond((" ".join(output) + " ").lower())
         return
 
     def gogui_rules_side_to_move_cmd(self, args):
@@ -321,22 +356,14 @@ class GtpConnection:
 
     def gogui_rules_board_cmd(self, args):
         size = self.board.size
-        str = ''
-        for row in range(size-1, -1, -1):
-            start = self.board.row_start(row + 1)
-            for i in range(size):
-                #str += '.'
-                point = self.board.board[start + i]
-                if point == BLACK:
-                    str += 'X'
-                elif point == WHITE:
-                    str += 'O'
-                elif point == EMPTY:
-                    str += '.'
-                else:
-                    assert False
-            str += '\n'
-        self.respond(str)
+        # one C-level byte translation over the whole board buffer,
+        # then a bytes slice per displayed row
+        raw = self.board.board.astype(np.uint8).tobytes().translate(_BOARD_TRANS)
+        rows = []
+        for row in range(size, 0, -1):
+            start = self.board.row_start(row)
+            rows.append(raw[start : start + size])
+        self.respond(b"\n".join(rows).decode() + "\n")
 
     def gogui_rules_final_result_cmd(self, args):
         if self.board.get_empty_points().size == 0:
@@ -365,19 +392,21 @@ class GtpConnection:
 
     #response is in the form: "winner [move]"
     def solve_cmd(self, args):
-        signal.signal(signal.SIGALRM, handler)
+        #monotonic deadline checked inside the search, instead of the
+        #coarse (and Unix-only) SIGALRM unwind
+        deadline = time.monotonic() + self.time
         try:
-            signal.alarm(self.time)
-
             #implement the actual solver here
             board_copy = self.board.copy()
             current_player = board_copy.current_player
 
-            result = iterativeDeepening(board_copy)
-
-            self.board.updateHash(board_copy)
-            move = format_point(point_to_coord(self.board.hashTable.lookup(self.board.hash())[1], board_copy.size))
-            signal.alarm(0)
+            if numba_search is not None:
+                result, winMove = numba_search.solve(board_copy, deadline=deadline)
+            else:
+                result = iterativeDeepening(board_copy, deadline)
+                self.board.updateHash(board_copy)
+                winMove = self.board.hashTable.lookup(self.board.hash())[1]
+            move = format_point(point_to_coord(winMove, board_copy.size))
 
             if (self.genMoveRunning == False):
                 if (result == 5 and current_player == BLACK):
@@ -391,86 +420,125 @@ class GtpConnection:
                 else:
                     self.respond("draw %s" %move)
 
-            return self.board.hashTable.lookup(self.board.hash())[1]
+            return winMove
         except:
             if (self.genMoveRunning == False):
                 self.respond("unknown")
 
-def iterativeDeepening(board):
+#how many nodes alphabeta_tt visits between deadline checks
+_DEADLINE_CHECK_MASK = 1023
+_nodeCount = 0
+
+def iterativeDeepening(board, deadline):
     result = 1
     for d in range(1, board.get_empty_points().size + 1):
-        result = alphabeta_tt(board, -INFINITY, INFINITY, board.hashTable, 0, INFINITY, d)
+        result = alphabeta_tt(board, -INFINITY, INFINITY, board.hashTable, 0, INFINITY, d, deadline)
         if result == 5 or result == -5:
             return result
     return result
 
-def storeScore(tt, state, score):
-    tt.storeScore(state.hash(), score)
+def storeScore(tt, h, score, flag, depth):
+    tt.storeScore(h, score, flag, depth)
     return score
 
-def storeMove(tt, state, move):
-    tt.storeMove(state.hash(), move)
+def storeMove(tt, h, move):
+    tt.storeMove(h, move)
     return move
-        
-def alphabeta_tt(state, alpha, beta, tt, depth, depthMove, depthLimit):
-    result = tt.lookup(state.hash())
+
+def alphabeta_tt(state, alpha, beta, tt, depth, depthMove, depthLimit, deadline):
+    #check the clock once per 1024 nodes; unwinding through
+    #SearchTimeout leaves the TT intact for the next try
+    global _nodeCount
+    _nodeCount += 1
+    if (_nodeCount & _DEADLINE_CHECK_MASK == 0 and time.monotonic() >= deadline):
+        raise SearchTimeout()
+    #hash the position once per node and reuse it for lookup and stores
+    h = state.hash()
+    remaining = depthLimit - depth
+    result = tt.lookup(h)
+    ttMove = None
     if (result != None):
         if (result[0] == 5):
             return result[0]
-    if (state.endOfGame() or depth == depthLimit):
-        result = state.staticallyEvaluateForToPlay()
-        return storeScore(tt, state, result)
+        ttMove = result[1]
+        #use the stored bound if it was searched at least as deep
+        if (result[3] != None and result[3] >= remaining):
+            if (result[2] == EXACT):
+                return result[0]
+            elif (result[2] == LOWER and result[0] > alpha):
+                alpha = result[0]
+            elif (result[2] == UPPER and result[0] < beta):
+                beta = result[0]
+            if (alpha >= beta):
+                return result[0]
+    term, staticResult = state.evaluate_and_terminal()
+    if (term or depth == depthLimit):
+        return storeScore(tt, h, staticResult, EXACT, remaining)
 
     #order the moves according to heuristic
-    #orderedMoves will be a list that holds 2-tuples (move, heuristic)
-    orderedMoves = orderMoves(state)
+    #orderedMoves is an ndarray of moves, best heuristic first
+    orderedMoves = orderMoves(state, tt)
+
+    #try the move stored in the TT first - it caused the best score or
+    #a cutoff before, so it makes alpha cutoffs happen immediately
+    if (ttMove != None):
+        moves = [ttMove] + [m for m in orderedMoves if m != ttMove]
+    else:
+        moves = orderedMoves
 
     #run alphabeta
-    for m in orderedMoves:
-        m = m[0]
+    alphaOriginal = alpha
+    for m in moves:
         winMove = None
         state.play_move(m, state.current_player)
-        value = -alphabeta_tt(state, -beta, -alpha, tt, depth + 1, depthMove, depthLimit)
+        value = -alphabeta_tt(state, -beta, -alpha, tt, depth + 1, depthMove, depthLimit, deadline)
         if value > alpha:
             if (value == 0 or value == 5):
                 winMove = m
             alpha = value
         state.undoMove()
         if (winMove != None):
-            storeMove(tt, state, winMove)
+            storeMove(tt, h, winMove)
         if value >= beta:
-            return storeScore(tt, state, beta)
-    return storeScore(tt, state, alpha)
-
-def orderMoves(state):
-    orderedMoves = []
-    for m in state.get_empty_points():
-        state.play_move(m, state.current_player)
-        heuristic = state.staticallyEvaluateForToPlay()
-        if (len(orderedMoves) > 0):
-            index = 0
-            while (index < len(orderedMoves) and orderedMoves[index][1] > heuristic):
-                index += 1
-            if (index >= len(orderedMoves)):
-                tempTuple = (m, heuristic)
-                orderedMoves.append(tempTuple)
-            else:
-                tempTuple = (m, heuristic)
-                orderedMoves.insert(index, tempTuple)
+            return storeScore(tt, h, beta, LOWER, remaining)
+    flag = EXACT if alpha > alphaOriginal else UPPER
+    return storeScore(tt, h, alpha, flag, remaining)
+
+def orderMoves(state, tt):
+    empties = state.get_empty_points()
+    heur = np.empty(empties.size, dtype=np.int32)
+    h = state.hash()
+    cp = state.current_player
+    for i in range(empties.size):
+        m = empties[i]
+        #the child hash is one XOR away, so transposed children can
+        #reuse the static evaluation cached in the TT
+        child_h = h ^ int(state.table[state._zobrist_index(m)][cp - 1])
+        entry = tt.lookup(child_h)
+        if (entry != None and entry[4] != None):
+            heur[i] = entry[4]
         else:
-            tempTuple = (m, heuristic)
-            orderedMoves.append(tempTuple)
-        state.undoMove()
-    return orderedMoves
+            state.play_move(m, cp)
+            heur[i] = state.staticallyEvaluateForToPlay()
+            state.undoMove()
+            tt.storeEval(child_h, int(heur[i]))
+    # one C-level sort instead of an insertion sort per child
+    order = np.argsort(-heur)
+    return empties[order]
         
 def negamaxBoolean(state, depth, moveDepth):
     move = -1
     if state.endOfGame():
         return (state.staticallyEvaluateForToPlay(), move)
+    #bind the hot attributes to locals once per node; the current
+    #player is back to the same color after each play/undo pair
+    play = state.play_move
+    undo = state.undoMove
+    cp = state.current_player
     for m in state.get_empty_points():
-        state.play_move(m, state.current_player)
+        play(m, cp)
         success = not negamaxBoolean(state, depth + 1, moveDepth)[0]
-        state.undoMove()
+        undo()
         if success:
             if (moveDepth > depth):
                 moveDepth = depth
@@ -504,9 +572,12 @@ def solveForColor(state, color):
 def alphabeta(state, alpha, beta, depth, moveDepth):
     move = -1
     if state.endOfGame():
-        return (state.staticallyEvaluateForToPlay(), -1) 
+        return (state.staticallyEvaluateForToPlay(), -1)
+    play = state.play_move
+    undo = state.undoMove
+    cp = state.current_player
     for m in state.get_empty_points():
-        state.play_move(m, state.current_player)
+        play(m, cp)
         value = -(alphabeta(state, -beta, -alpha, depth + 1, moveDepth)[0])
         if value > alpha:
             if (moveDepth > depth):
@@ -514,14 +585,11 @@ def alphabeta(state, alpha, beta, depth, moveDepth):
                 move = m
                 print(move, moveDepth)
             alpha = value
-        state.undoMove()
+        undo()
         if value >= beta:
             return (beta, move)
     return (alpha, move)
 
-def handler(signum, frame):
-    raise OSError("Time's up!")
-
 def point_to_coord(point, boardsize):
     """
     Transform point given as board array index 
@@ -577,11 +645,13 @@ def move_to_coord(point_str, board_size):
     return row, col
 
 
+# built once at import; color_to_int used to rebuild this dict per call
+_COLOR_TABLE = {"b": BLACK, "w": WHITE, "e": EMPTY, "BORDER": BORDER}
+
+
 def color_to_int(c):
     """convert character to the appropriate integer code"""
-    color_to_int = {"b": BLACK, "w": WHITE, "e": EMPTY, "BORDER": BORDER}
-    
     try:
-        return color_to_int[c]
-    except:
+        return _COLOR_TABLE[c]
+    except KeyError:
         raise KeyError("\"{}\" wrong color".format(c))
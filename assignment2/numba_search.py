@@ -0,0 +1,311 @@
+"""
+numba_search.py
+
+Numba-compiled alpha-beta search kernel for the Gomoku solver.
+
+The pure Python search in gtp_connection.py (alphabeta_tt/orderMoves)
+spends almost all of its time doing integer comparisons over board
+states inside the interpreter. The kernel below does the same search
+in nopython mode over a struct-of-arrays view of the board state:
+the board, the incremental empty-point list and its index, the
+packed lines, the Zobrist keys and the flat transposition table are
+all primitive-typed ndarrays, so every kernel function compiles
+without object mode. Moves are played/undone with the play_move_nb/
+undo_nb helpers (array writes plus XOR hash updates).
+
+GTP I/O stays in Python; GtpConnection.solve_cmd packages the board
+into a SearchState of plain arrays once and dispatches into the
+jitted search.
+"""
+
+from collections import namedtuple
+import time
+
+import numpy as np
+from numba import njit, objmode
+from board_util import (
+    BLACK,
+    WHITE,
+    EMPTY,
+    INFINITY,
+    SearchTimeout,
+    coord_to_point,
+)
+
+"""
+The transposition table is a flat open-addressed hash map from the
+int64 Zobrist key to a packed int64 value, khash-style: a probe is a
+single cache-line read instead of a Python dict lookup. The value
+packs (score + 16) in the high 32 bits and (move + 1) in the low 32
+bits, so 0 means "nothing stored" for both halves. A key of 0 marks
+an empty slot; inserts stop at 3/4 load so probing always terminates.
+"""
+TT_BITS = 23
+TT_MASK = (1 << TT_BITS) - 1
+TT_LIMIT = 3 * (1 << TT_BITS) // 4
+
+
+@njit(cache=True)
+def _tt_slot(keys, h):
+    """Linear-probe for h; returns (slot index, key actually used)."""
+    if h == 0:
+        h = 1  # 0 marks an empty slot
+    i = h & TT_MASK
+    while keys[i] != 0 and keys[i] != h:
+        i = (i + 1) & TT_MASK
+    return i, h
+
+
+@njit(cache=True)
+def _tt_insert(keys, vals, count, i, h):
+    if count[0] >= TT_LIMIT:
+        return False
+    keys[i] = h
+    vals[i] = 0
+    count[0] += 1
+    return True
+
+
+@njit(cache=True)
+def _store_score(keys, vals, count, h, score):
+    i, h = _tt_slot(keys, h)
+    if keys[i] != h:
+        if not _tt_insert(keys, vals, count, i, h):
+            return
+    vals[i] = (vals[i] & 0xFFFFFFFF) | ((score + 16) << 32)
+
+
+@njit(cache=True)
+def _store_move(keys, vals, count, h, move):
+    i, h = _tt_slot(keys, h)
+    if keys[i] != h:
+        if not _tt_insert(keys, vals, count, i, h):
+            return
+    vals[i] = (vals[i] >> 32 << 32) | (move + 1)
+
+
+# the arrays a search operates on, bundled for the Python-side driver;
+# the kernel itself takes the individual arrays as positional args
+SearchState = namedtuple(
+    "SearchState", ["board", "empties", "empty_idx", "lines", "line_lens", "zkeys"]
+)
+
+
+@njit(cache=True)
+def play_move_nb(board, empties, empty_idx, n_empty, m, color):
+    """
+    Play m for color: write the stone and swap-remove m from the
+    live region of the empty list. Returns the new empty count; m is
+    parked just past the live region so undo_nb is O(1).
+    """
+    board[m] = color
+    i = empty_idx[m]
+    last = n_empty - 1
+    last_point = empties[last]
+    empties[i] = last_point
+    empty_idx[last_point] = i
+    empties[last] = m
+    empty_idx[m] = last
+    return last
+
+
+@njit(cache=True)
+def undo_nb(board, empties, empty_idx, n_empty, m):
+    """Undo the most recent play_move_nb of m. Returns the new count."""
+    board[m] = EMPTY
+    return n_empty + 1
+
+
+@njit(cache=True)
+def _static_eval(board, lines, line_lens, to_play, n_empty):
+    """
+    Single-pass equivalent of GoBoard.staticallyEvaluateForToPlay.
+    Finds the longest run of stones over all precomputed lines
+    (capped at 5) and scores it from to_play's point of view.
+    """
+    best_color = EMPTY
+    best_len = 1
+    for li in range(lines.shape[0]):
+        prev = -1
+        counter = 1
+        for k in range(line_lens[li]):
+            color = board[lines[li, k]]
+            if color == prev:
+                counter += 1
+            else:
+                counter = 1
+                prev = color
+            if prev != EMPTY and counter > best_len:
+                best_len = counter
+                best_color = prev
+                if best_len >= 5:
+                    best_len = 5
+    if n_empty == 0 and best_len != 5:
+        return 0
+    if best_color == EMPTY:
+        return 1
+    if best_color == to_play:
+        return best_len
+    return -best_len
+
+
+@njit(cache=True)
+def _check_deadline(status, deadline):
+    """
+    status is [node counter, timed-out flag]. The wall clock is only
+    consulted every 1024 nodes (through an objmode hop, since the
+    time module is not available in nopython mode).
+    """
+    status[0] += 1
+    if status[1] == 1:
+        return True
+    if status[0] & 1023 == 0:
+        with objmode(now='float64'):
+            now = time.monotonic()
+        if now >= deadline:
+            status[1] = 1
+            return True
+    return False
+
+
+@njit(cache=True)
+def _ab_core(board, empties, empty_idx, lines, line_lens, zkeys, to_play, h,
+             n_empty, alpha, beta, depth, limit, keys, vals, count,
+             deadline, status):
+    """
+    Negamax alpha-beta over the struct-of-arrays board state,
+    mirroring alphabeta_tt. Scores and winning moves are stored in
+    the flat transposition table keyed by the Zobrist hash. When the
+    deadline passes, the whole tree unwinds immediately (returning a
+    dummy score) and nothing more is stored.
+    """
+    if _check_deadline(status, deadline):
+        return 0
+    i, hkey = _tt_slot(keys, h)
+    if keys[i] == hkey and (vals[i] >> 32) - 16 == 5:
+        return 5
+    score = _static_eval(board, lines, line_lens, to_play, n_empty)
+    if score == 5 or score == -5 or n_empty == 0 or depth == limit:
+        _store_score(keys, vals, count, h, score)
+        return score
+
+    # snapshot the live empty points (children permute the list),
+    # then order them by the static heuristic, best first
+    moves = empties[:n_empty].copy()
+    opponent = BLACK + WHITE - to_play
+    heur = np.empty(n_empty, dtype=np.int64)
+    for i in range(n_empty):
+        m = moves[i]
+        ne = play_move_nb(board, empties, empty_idx, n_empty, m, to_play)
+        heur[i] = _static_eval(board, lines, line_lens, opponent, ne)
+        undo_nb(board, empties, empty_idx, ne, m)
+    order = np.argsort(-heur)
+
+    for i in range(n_empty):
+        m = moves[order[i]]
+        ne = play_move_nb(board, empties, empty_idx, n_empty, m, to_play)
+        child_h = h ^ zkeys[m, to_play - 1]
+        value = -_ab_core(board, empties, empty_idx, lines, line_lens, zkeys,
+                          opponent, child_h, ne, -beta, -alpha, depth + 1,
+                          limit, keys, vals, count, deadline, status)
+        undo_nb(board, empties, empty_idx, ne, m)
+        if status[1] == 1:
+            return 0
+        if value > alpha:
+            if value == 0 or value == 5:
+                _store_move(keys, vals, count, h, m)
+            alpha = value
+        if value >= beta:
+            _store_score(keys, vals, count, h, beta)
+            return beta
+    _store_score(keys, vals, count, h, alpha)
+    return alpha
+
+
+def _pack_lines(board):
+    """
+    Pad the board's rows/cols/diags point lists into a rectangular
+    int64 array plus a length vector, for use inside the kernel.
+    """
+    all_lines = board.rows + board.cols + board.diags
+    lines = np.full((len(all_lines), board.size), -1, dtype=np.int64)
+    line_lens = np.empty(len(all_lines), dtype=np.int64)
+    for i, line in enumerate(all_lines):
+        lines[i, : len(line)] = line
+        line_lens[i] = len(line)
+    return lines, line_lens
+
+
+def _pack_zobrist(board):
+    """
+    Re-index the board's Zobrist table by padded board point so the
+    kernel can XOR keys in and out with plain array lookups.
+    """
+    zkeys = np.zeros((board.maxpoint, 2), dtype=np.int64)
+    for i in range(board.size * board.size):
+        row = i // board.size + 1
+        col = i % board.size + 1
+        point = coord_to_point(row, col, board.size)
+        zkeys[point, 0] = board.table[i][0]
+        zkeys[point, 1] = board.table[i][1]
+    return zkeys
+
+
+def _pack_state(board):
+    """
+    Package a GoBoard into the struct-of-arrays SearchState the
+    kernel operates on.
+    """
+    arr = board.board.astype(np.int64)
+    lines, line_lens = _pack_lines(board)
+    zkeys = _pack_zobrist(board)
+    empties = board.get_empty_points().astype(np.int64)
+    empty_idx = np.full(arr.shape[0], -1, dtype=np.int64)
+    empty_idx[empties] = np.arange(empties.size, dtype=np.int64)
+    return SearchState(arr, empties, empty_idx, lines, line_lens, zkeys)
+
+
+def solve(board, max_depth=None, deadline=None):
+    """
+    Iterative deepening driver around the jitted kernel.
+    Returns (result, move) where result is the negamax score for the
+    current player and move is the stored winning move (None if the
+    table holds no move for the root). Raises SearchTimeout if the
+    deadline passes before any deepening iteration finds a proven
+    result.
+    """
+    state = _pack_state(board)
+    keys = np.zeros(1 << TT_BITS, dtype=np.int64)
+    vals = np.zeros(1 << TT_BITS, dtype=np.int64)
+    count = np.zeros(1, dtype=np.int64)
+    status = np.zeros(2, dtype=np.int64)
+    n_empty = state.empties.size
+    to_play = int(board.current_player)
+    h = np.int64(board.hash())
+    if max_depth is None:
+        max_depth = n_empty
+    if deadline is None:
+        deadline = np.inf
+    result = 1
+    for d in range(1, max_depth + 1):
+        result = _ab_core(state.board, state.empties, state.empty_idx,
+                          state.lines, state.line_lens, state.zkeys, to_play,
+                          h, n_empty, -INFINITY, INFINITY, 0, d,
+                          keys, vals, count, float(deadline), status)
+        if status[1] == 1:
+            raise SearchTimeout()
+        if result == 5 or result == -5:
+            break
+    i, hkey = _tt_slot(keys, h)
+    move = None
+    if keys[i] == hkey and vals[i] & 0xFFFFFFFF != 0:
+        move = int(vals[i] & 0xFFFFFFFF) - 1
+    return result, move
+
+
+def warmup(board):
+    """
+    Force a one-call compile of the kernel so the (large) JIT cost is
+    paid at startup instead of inside the first timed solve.
+    """
+    solve(board, max_depth=1)
@@ -1,6 +1,14 @@
+# Bound types for stored scores
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
 class TranspositionTable(object):
-# Table is stored in a dictionary, with board code as key, 
-# and minimax score as the value
+# Table is stored in a dictionary, with board code as key,
+# and [score, move, flag, depth, eval] as the value, where flag says
+# whether score is exact or an alpha/beta bound, depth is the
+# remaining search depth the score is valid for, and eval caches the
+# static evaluation of the position for move ordering
 
     # Empty dictionary
     def __init__(self):
@@ -9,19 +17,30 @@ class TranspositionTable(object):
     # Used to print the whole table with print(tt)
     def __repr__(self):
         return self.table.__repr__()
-        
-    def storeScore(self, code, score):
-        if self.lookup(code) == None:
-            self.table[code] = [score, None]
+
+    def storeScore(self, code, score, flag=EXACT, depth=0):
+        entry = self.table.get(code)
+        if entry == None:
+            self.table[code] = [score, None, flag, depth, None]
         else:
-            self.table[code][0] = score
+            entry[0] = score
+            entry[2] = flag
+            entry[3] = depth
 
     def storeMove(self, code, move):
-        if self.lookup(code) == None:
-            self.table[code] = [None, move]
+        entry = self.table.get(code)
+        if entry == None:
+            self.table[code] = [None, move, None, None, None]
         else:
-            self.table[code][1] = move
-    
+            entry[1] = move
+
+    def storeEval(self, code, value):
+        entry = self.table.get(code)
+        if entry == None:
+            self.table[code] = [None, None, None, None, value]
+        else:
+            entry[4] = value
+
     # Python dictionary returns 'None' if key not found by get()
     def lookup(self, code):
         return self.table.get(code)